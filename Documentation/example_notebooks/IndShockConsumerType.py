@@ -22,7 +22,7 @@
 # %% {"code_folding": [0]}
 # Initial imports and notebook setup, click arrow to show
 from HARK.ConsumptionSaving.ConsIndShockModel import IndShockConsumerType
-from HARK.utilities import plot_funcs_der, plot_funcs
+from HARK.utilities import plot_funcs
 import matplotlib.pyplot as plt
 import numpy as np
 
@@ -83,7 +83,7 @@ mystr = lambda number: "{:.4f}".format(number)
 # \mathfrak{v}'_t(a_t) = \DiscFac (1-\DiePrb_{t+1})  \mathbb{E}_{t} \left[ \Rfree (\PermGroFac_{t+1}\psi_{t+1})^{-\CRRA} v'_{t+1}(\Rfree/(\PermGroFac_{t+1} \psi_{t+1}) a_t + \theta_{t+1}) \right].
 # \end{eqnarray*}
 #
-# To solve the model, we choose an exogenous grid of $a_t$ values that span the range of values that could plausibly be achieved, compute $\mathfrak{v}'_t(a_t)$ at each of these points, calculate the value of consumption $c_t$ whose marginal utility is consistent with the marginal value of assets, then find the endogenous $m_t$ gridpoint as $m_t = a_t + c_t$.  The set of $(m_t,c_t)$ gridpoints is then interpolated to construct the consumption function.
+# To solve the model, we choose an exogenous grid of $a_t$ values that span the range of values that could plausibly be achieved, compute $\mathfrak{v}'_t(a_t)$ at each of these points, calculate the value of consumption $c_t$ whose marginal utility is consistent with the marginal value of assets, then find the endogenous $m_t$ gridpoint as $m_t = a_t + c_t$.  The set of $(m_t,c_t)$ gridpoints is then interpolated to construct the consumption function.  Because the first order condition is inverted in closed form, no root-finding is needed at any gridpoint; this relies on the time-separable CRRA utility assumed by `IndShockConsumerType`, which has no separate parameter for the elasticity of intertemporal substitution.
 
 # %% [markdown]
 # ## Example parameter values to construct an instance of IndShockConsumerType
@@ -112,7 +112,7 @@ mystr = lambda number: "{:.4f}".format(number)
 # | $(none)$ | Exponential nesting factor for base assets-above-minimum grid | $\texttt{aXtraNestFac}$ | $3$ | |
 # | $(none)$ | Additional values to add to assets-above-minimum grid | $\texttt{aXtraExtra}$ | $None$ | |
 # | $\underline{a}$| Artificial borrowing constraint (normalized) | $\texttt{BoroCnstArt}$ | $0.0$ | |
-# | $(none)$|Indicator for whether $\texttt{vFunc}$ should be computed | $\texttt{vFuncBool}$ | $True$ | |
+# | $(none)$|Indicator for whether $\texttt{vFunc}$ should be computed | $\texttt{vFuncBool}$ | $False$ | |
 # | $(none)$ |Indicator for whether $\texttt{cFunc}$ should use cubic splines | $\texttt{CubicBool}$ | $False$ |  |
 # |$T$| Number of periods in this type's "cycle" |$\texttt{T_cycle}$| $1$ | |
 # |(none)| Number of times the "cycle" occurs |$\texttt{cycles}$| $0$ | |
@@ -144,7 +144,7 @@ IdiosyncDict = {
     "aXtraExtra": [None],  # Additional values to add to aXtraGrid
     # A few other paramaters
     "BoroCnstArt": 0.0,  # Artificial borrowing constraint; imposed minimum level of end-of period assets
-    "vFuncBool": True,  # Whether to calculate the value function during solution
+    "vFuncBool": False,  # Whether to calculate the value function during solution
     "CubicBool": False,  # Preference shocks currently only compatible with linear cFunc
     "T_cycle": 1,  # Number of periods in the cycle for this agent type
     # Parameters only used in simulation
@@ -159,7 +159,7 @@ IdiosyncDict = {
 }
 
 # %% [markdown]
-# The distribution of permanent income shocks is specified as mean one lognormal, with an age-varying (underlying) standard deviation. The distribution of transitory income shocks is also mean one lognormal, but with an additional point mass representing unemployment; the transitory shocks are adjusted so that the distribution is still mean one.  The continuous distributions are discretized with an equiprobable distribution.
+# The distribution of permanent income shocks is specified as mean one lognormal, with an age-varying (underlying) standard deviation. The distribution of transitory income shocks is also mean one lognormal, but with an additional point mass representing unemployment; the transitory shocks are adjusted so that the distribution is still mean one.  The continuous distributions are discretized with an equiprobable distribution.  Because of the unemployment point mass, the joint distribution of $(\psi,\theta)$ is *not* equiprobable; the solver therefore computes each expectation as a single probability-weighted sum (one `np.dot` with the probability mass vector) over all of the joint shock outcomes at every gridpoint at once.
 #
 # Optionally, the user can specify the period when the individual retires and escapes essentially all income risk as `T_retire`; this can be turned off by setting the parameter to $0$.  In retirement, all permanent income shocks are turned off, and the only transitory shock is an "unemployment" shock, likely with small probability; this prevents the retired problem from degenerating into a perfect foresight model.
 #
@@ -167,7 +167,7 @@ IdiosyncDict = {
 #
 # The artificial borrowing constraint $\texttt{BoroCnstArt}$ can be set to `None` to turn it off.
 #
-# It is not necessary to compute the value function in this model, and it is not computationally free to do so.  You can choose whether the value function should be calculated and returned as part of the solution of the model with $\texttt{vFuncBool}$.  The consumption function will be constructed as a piecewise linear interpolation when $\texttt{CubicBool}$ is `False`, and will be a piecewise cubic spline interpolator if `True`.
+# It is not necessary to compute the value function in this model, and it is not computationally free to do so.  You can choose whether the value function should be calculated and returned as part of the solution of the model with $\texttt{vFuncBool}$; since this notebook only examines the consumption function, we leave it off.  The consumption function will be constructed as a piecewise linear interpolation when $\texttt{CubicBool}$ is `False`, and will be a piecewise cubic spline interpolator if `True`.
 
 # %% [markdown] {"heading_collapsed": true}
 # ## Solving and examining the solution of the idiosyncratic income shocks model
@@ -181,6 +181,13 @@ IndShockExample.cycles = 0  # Make this type have an infinite horizon
 IndShockExample.solve()
 
 
+# %% [markdown] {"hidden": true}
+# The discretized income shock distribution stores its atoms as a $2 \times N$ array: the first row holds the permanent shocks $\psi$ and the second the transitory shocks $\theta$, each a flat 1D array over the $N = N_\psi N_\theta$ joint outcomes.  The solver broadcasts these rows against the grid of end-of-period assets to compute $m_{t+1}$ for every shock and asset gridpoint at once, so it relies on this layout (rather than, say, $(N,1)$ column vectors).
+
+# %% {"hidden": true}
+IncShkAtoms = IndShockExample.IncShkDstn[0].atoms
+assert IncShkAtoms.ndim == 2 and IncShkAtoms.shape[0] == 2
+
 # %% [markdown] {"hidden": true}
 # After solving the model, we can examine an element of this type's $\texttt{solution}$:
 
@@ -195,13 +202,20 @@ print(vars(IndShockExample.solution[0]))
 # Let's take a look at the consumption function by plotting it, along with its derivative (the MPC):
 
 # %% {"hidden": true}
+# Evaluate the consumption function and the MPC together on one shared grid
+mNrmMin = IndShockExample.solution[0].mNrmMin
+mGrid = np.linspace(mNrmMin, 5, 1000)
+cGrid, MPCgrid = IndShockExample.solution[0].cFunc.eval_with_derivative(mGrid)
+
 print("Consumption function for an idiosyncratic shocks consumer type:")
-plt.plot(np.arange(0,1.5,.1),np.arange(0,1.5,.1), color = 'black', ls = '--')
-plot_funcs(IndShockExample.solution[0].cFunc, IndShockExample.solution[0].mNrmMin, 5)
+plt.plot([0, 1.5], [0, 1.5], color="black", ls="--")
+plt.plot(mGrid, cGrid)
+plt.xlim([mNrmMin, 5])
+plt.show()
 print("Marginal propensity to consume for an idiosyncratic shocks consumer type:")
-plot_funcs_der(
-    IndShockExample.solution[0].cFunc, IndShockExample.solution[0].mNrmMin, 5
-)
+plt.plot(mGrid, MPCgrid)
+plt.xlim([mNrmMin, 5])
+plt.show()
 
 # %% [markdown] {"hidden": true}
 # The lower part of the consumption function is linear with a slope of 1, representing the *constrained* part of the consumption function where the consumer *would like* to consume more by borrowing-- his marginal utility of consumption exceeds the marginal value of assets-- but he is prevented from doing so by the artificial borrowing constraint.
@@ -254,47 +268,67 @@ plot_funcs(IndShockExample.solution[0].cFunc.functions, -0.25, 5.0)
 #
 # Here, we will simulate 10,000 consumers for 120 periods.  All newly born agents will start with permanent income of exactly $P_t = 1.0 = \exp(\texttt{pLvlInitMean})$, as $\texttt{pLvlInitStd}$ has been set to zero; they will have essentially zero assets at birth, as $\texttt{aNrmInitMean}$ is $-6.0$; assets will be less than $1\%$ of permanent income at birth.
 #
-# These example parameter values were already passed as part of the parameter dictionary that we used to create `IndShockExample`, so it is ready to simulate.  We need to set the `track_vars` attribute to indicate the variables for which we want to record a *history*.
+# These example parameter values were already passed as part of the parameter dictionary that we used to create `IndShockExample`, so it is ready to simulate.  We need to set the `track_vars` attribute to indicate the variables for which we want to record a *history*; here we only track the variables used in the figures below, since every tracked variable adds a (T_sim, AgentCount) array to the history.
 
 # %%
 np.exp(-6)
 
 # %%
-IndShockExample.track_vars = ["aNrm", "mNrm", "cNrm", "pLvl"]
+IndShockExample.track_vars = ["mNrm", "cNrm"]
 IndShockExample.initialize_sim()
 IndShockExample.simulate()
 
+# %%
+# Each history is a C-contiguous (T_sim, AgentCount) array, so averaging across
+# agents within a period reads contiguous memory
+assert IndShockExample.history["mNrm"].shape == (
+    IndShockExample.T_sim,
+    IndShockExample.AgentCount,
+)
+assert IndShockExample.history["mNrm"].flags["C_CONTIGUOUS"]
+
 
 # %% [markdown]
 # We can now look at the simulated data in aggregate or at the individual consumer level.  Like in the perfect foresight model, we can plot average (normalized) market resources over time, as well as average consumption:
+#
+# Note that neither `initialize_sim` nor `simulate` re-solves the model: because `cycles = 0`, every simulated period uses the single infinite horizon solution already stored in `solution[0]`.  Agents are born with essentially no assets, so the first couple of decades of each plot show the population converging to its ergodic distribution; we keep those periods in the figures because that transition is what they illustrate.
 
 # %%
 
 # %% {"code_folding": []}
 # Define the saving rate function
-def savRteFunc(SomeType, m, t):
+def savRteFunc(SomeType, m_hist, t=0):
     """
     Parameters:
     ----------
         SomeType:
              Agent type that has been solved and simulated.
-        m:
-            normalized market resources of agent
+        m_hist:
+            normalized market resources of agents; a scalar, a 1D array, or
+            the entire simulated history with shape (T_sim, AgentCount)
         t:
             age of agent (from starting in the workforce)
 
 
     Returns:
     --------
-        savRte: float
+        savRte: np.array
+            saving rate of each agent, with the same shape as m_hist
 
     """
-    inc = (SomeType.Rfree - 1.0) * (
-        m - 1.0
-    ) + 1.0  # Normalized by permanent labor income
-    cns = SomeType.solution[t].cFunc(m)  # Consumption (normalized)
-    sav = inc - cns  # Flow of saving this period
-    savRte = sav / inc  # Saving Rate
+    m_hist = np.asarray(m_hist)
+    cFunc = SomeType.solution[t].cFunc
+    Rfree = SomeType.Rfree
+    # Income normalized by permanent labor income, (Rfree - 1)*(m - 1) + 1,
+    # built up in a single buffer
+    inc = m_hist - 1.0
+    inc *= Rfree - 1.0
+    inc += 1.0
+    # Evaluate the consumption function once on the whole (flattened) history
+    cns = cFunc(m_hist.ravel()).reshape(m_hist.shape)
+    # Reuse the consumption buffer for saving and then the saving rate
+    savRte = np.subtract(inc, cns, out=cns)  # Flow of saving this period
+    np.divide(savRte, inc, out=savRte)  # Saving Rate
     return savRte
 
 
@@ -305,21 +339,26 @@ IndShockExample.history["mNrm"].shape
 IndShockExample.solution[0].cFunc(2)
 
 # %%
-np.mean([savRteFunc(IndShockExample, IndShockExample.history["mNrm"][t], 0) for t in range(120)], axis = 1)
+# Compute all of the cross-sectional means in one place, so each history array
+# is swept exactly once and savRteFunc is evaluated on the history only once
+mNrmMean = IndShockExample.history["mNrm"].mean(axis=1)
+cNrmMean = IndShockExample.history["cNrm"].mean(axis=1)
+savRteMean = savRteFunc(IndShockExample, IndShockExample.history["mNrm"]).mean(axis=1)
+savRteMean
 
 # %%
-plt.plot(np.mean(IndShockExample.history["mNrm"], axis=1))
+plt.plot(mNrmMean)
 plt.xlabel("Time")
 plt.ylabel("Mean market resources")
 plt.show()
 
-plt.plot(np.mean(IndShockExample.history["cNrm"], axis=1))
+plt.plot(cNrmMean)
 plt.xlabel("Time")
 plt.ylabel("Mean consumption")
 plt.show()
 
 
-plt.plot(np.mean([savRteFunc(IndShockExample, IndShockExample.history["mNrm"][t], 0) for t in range(120)], axis = 1))
+plt.plot(savRteMean)
 plt.xlabel("Time")
 plt.ylabel("Mean saving rate ")
 plt.show()
@@ -9,6 +9,7 @@ from HARK.ConsumptionSaving.ConsIndShockModel import (
     init_idiosyncratic_shocks,
     init_lifecycle,
 )
+from HARK.distribution import calc_expectation
 from HARK.tests import HARK_PRECISION
 
 
@@ -105,6 +106,44 @@ class testIndShockConsumerType(unittest.TestCase):
             solution.cFunc(4).tolist(), 1.00280, places=HARK_PRECISION
         )
 
+    def test_EndOfPrdvP_matches_atom_loop(self):
+        LifecycleExample = IndShockConsumerType(**init_lifecycle)
+        LifecycleExample.cycles = 1
+        LifecycleExample.solve()
+
+        solver = ConsIndShockSolverBasic(
+            LifecycleExample.solution[1],
+            LifecycleExample.IncShkDstn[0],
+            LifecycleExample.LivPrb[0],
+            LifecycleExample.DiscFac,
+            LifecycleExample.CRRA,
+            LifecycleExample.Rfree,
+            LifecycleExample.PermGroFac[0],
+            LifecycleExample.BoroCnstArt,
+            LifecycleExample.aXtraGrid,
+            LifecycleExample.vFuncBool,
+            LifecycleExample.CubicBool,
+        )
+        solver.prepare_to_solve()
+        solver.prepare_to_calc_EndOfPrdvP()
+        EndOfPrdvP = solver.calc_EndOfPrdvP()
+
+        # The vectorized expectation over the whole shock grid should match
+        # evaluating next period's marginal value one shock atom at a time
+        def vp_next_atom(shocks, a_nrm):
+            m_nrm_next = solver.Rfree / (solver.PermGroFac * shocks[0]) * a_nrm
+            return shocks[0] ** (-solver.CRRA) * solver.vPfuncNext(
+                m_nrm_next + shocks[1]
+            )
+
+        EndOfPrdvP_loop = (
+            solver.DiscFacEff
+            * solver.Rfree
+            * solver.PermGroFac ** (-solver.CRRA)
+            * calc_expectation(solver.IncShkDstn, vp_next_atom, solver.aNrmNow)
+        )
+        self.assertTrue(np.allclose(EndOfPrdvP, EndOfPrdvP_loop))
+
     def test_simulated_values(self):
         self.agent.initialize_sim()
         self.agent.simulate()
@@ -2162,9 +2162,11 @@ class LowerEnvelope(HARKinterpolator1D):
         if nan_bool:
             self.compare = np.nanmin
             self.argcompare = np.nanargmin
+            self.pairwise_compare = np.fmin
         else:
             self.compare = np.min
             self.argcompare = np.argmin
+            self.pairwise_compare = np.minimum
 
         self.functions = []
         for function in functions:
@@ -2180,11 +2182,13 @@ class LowerEnvelope(HARKinterpolator1D):
         if _isscalar(x):
             y = self.compare([f(x) for f in self.functions])
         else:
-            m = len(x)
-            fx = np.zeros((m, self.funcCount))
-            for j in range(self.funcCount):
-                fx[:, j] = self.functions[j](x)
-            y = self.compare(fx, axis=1)
+            # Take a running elementwise minimum rather than filling an (m,funcCount)
+            # array and reducing across it; this avoids a strided copy of every
+            # function's output.  _evalAndDer still builds that array, as it needs
+            # the argmin to pick each point's derivative.
+            y = np.array(self.functions[0](x), dtype=float)
+            for j in range(1, self.funcCount):
+                self.pairwise_compare(y, self.functions[j](x), out=y)
         return y
 
     def _der(self, x):
@@ -7,7 +7,12 @@ import numpy as np
 
 from HARK.interpolation import BilinearInterp
 from HARK.interpolation import CubicHermiteInterp as CubicInterp
-from HARK.interpolation import LinearInterp, QuadlinearInterp, TrilinearInterp
+from HARK.interpolation import (
+    LinearInterp,
+    LowerEnvelope,
+    QuadlinearInterp,
+    TrilinearInterp,
+)
 
 
 class testsLinearInterp(unittest.TestCase):
@@ -40,6 +45,32 @@ class testsLinearInterp(unittest.TestCase):
         self.assertEqual(linear(1.5), 3.5)
 
 
+class testsLowerEnvelope(unittest.TestCase):
+    """tests for LowerEnvelope, comparing the vectorized evaluation with
+    the pointwise minimum of its component functions
+    """
+
+    def setUp(self):
+        self.unc = LinearInterp(np.array([0.0, 1.0, 5.0]), np.array([0.0, 0.8, 2.0]))
+        self.cnst = LinearInterp(np.array([0.0, 1.0]), np.array([0.0, 1.0]))
+        self.x = np.linspace(0.0, 6.0, 25)
+
+    def test_lower_envelope(self):
+        envelope = LowerEnvelope(self.unc, self.cnst, nan_bool=False)
+        expected = np.minimum(self.unc(self.x), self.cnst(self.x))
+        self.assertTrue(np.allclose(envelope(self.x), expected))
+        self.assertEqual(envelope(2.0), self.unc(2.0))
+        self.assertEqual(envelope(self.x.reshape(5, 5)).shape, (5, 5))
+
+    def test_nan_bool(self):
+        nan_func = LinearInterp(
+            np.array([1.0, 5.0]), np.array([0.0, 0.0]), lower_extrap=False
+        )
+        envelope = LowerEnvelope(self.cnst, nan_func, nan_bool=True)
+        y = envelope(np.array([0.5, 2.0]))
+        self.assertTrue(np.allclose(y, np.array([0.5, 0.0])))
+
+
 class testsCubicInterp(unittest.TestCase):
     """tests for CubicInterp, currently tests for uneven length of
     x, y and derivative with user input as lists, arrays, arrays with column orientation